@@ -12,7 +12,7 @@ from typing import List
 from .framebots import SimpleFrameBot
 from .plugins import BestOfReposter, MirroredFramePoster, FrameBotPlugin, AlternateFrameCommentPoster
 from .social import FacebookHelper
-from .utils import get_logger
+from .utils import get_logger, load_config
 
 logger = get_logger("main")
 
@@ -68,9 +68,7 @@ def _init_config_parser(config_directory: Path) -> configparser.ConfigParser:
                            " your directory of choice.")
             exit()
 
-    config = configparser.ConfigParser()
-    config.read(config_path, encoding='utf-8')
-    return config
+    return load_config(config_path)
 
 
 def _configure_window(movie_title: str) -> None:
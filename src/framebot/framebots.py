@@ -5,10 +5,11 @@ import datetime
 import os
 import re
 import time
+from concurrent.futures import ThreadPoolExecutor, Future
 from datetime import timedelta, datetime
 from pathlib import Path
 from re import Pattern
-from typing import List, Union
+from typing import List, Union, Tuple, Optional
 
 from . import utils, DEFAULT_WORKING_DIR
 from .model import FacebookFrame
@@ -24,9 +25,8 @@ def _get_filename(full_path: Union[str, Path]):
     :param full_path:
     :return:
     """
-    if issubclass(type(full_path), Path):
-        full_path = str(full_path)
-    return full_path[full_path.rfind(os.path.sep) + 1:]
+    # also handles the alternate separator, e.g. forward slashes on Windows
+    return os.path.basename(full_path)
 
 
 # placeholder
@@ -66,7 +66,7 @@ class SimpleFrameBot(Framebot):
         self.video_title = video_title
         self.upload_interval = upload_interval
         self.delete_files = delete_files
-        self.frames_directory = (frames_directory if type(frames_directory) is Path else Path(frames_directory))\
+        self.frames_directory = (frames_directory if isinstance(frames_directory, Path) else Path(frames_directory))\
             .resolve(strict=True)
         self.frames_ext = frames_ext
         self.frames_naming = frames_naming
@@ -82,6 +82,25 @@ class SimpleFrameBot(Framebot):
         self._log_parameters()
         self.logger.info("Done initializing.")
 
+    @property
+    def video_title(self) -> str:
+        return self._video_title
+
+    @video_title.setter
+    def video_title(self, video_title: str) -> None:
+        self._video_title = video_title
+        # the static parts of the default message are built once, not for every frame
+        self._default_message_prefix = f"{video_title}\nFrame "
+
+    @property
+    def total_frames_number(self) -> int:
+        return self._total_frames_number
+
+    @total_frames_number.setter
+    def total_frames_number(self, total_frames_number: int) -> None:
+        self._total_frames_number = total_frames_number
+        self._default_message_suffix = f" of {total_frames_number}"
+
     @property
     def frames_naming(self) -> Pattern:
         return self._frames_naming
@@ -99,17 +118,27 @@ class SimpleFrameBot(Framebot):
         """
         Initializes the frames list and total frames number
         """
-        self.frames: List[FacebookFrame] = []
-        for frame_path in self.frames_directory.glob(f"*.{self.frames_ext}"):
-            try:
-                index_number = self._get_frame_index_number(frame_path)
+        indexed_frames: List[Tuple[int, str]] = []
+        frames_suffix = f".{self.frames_ext}"
+        # scandir reads the directory in a single pass and caches the entry type, unlike glob
+        with os.scandir(self.frames_directory) as entries:
+            for entry in entries:
+                if not entry.name.endswith(frames_suffix) or not entry.is_file():
+                    continue
+                # the entry name is already the bare filename, so the regex can be applied directly
+                match = self.frames_naming.match(entry.name)
+                if match is None:
+                    # doesn't match the regex: not a valid frame
+                    self.logger.warning(f"File {entry.path} doesn't match the naming regex {self._frames_naming}. Bot"
+                                        f" will not load it as a frame.")
+                    continue
+                index_number = int(match.group(1))
+                # skip already uploaded frames before doing any other work on them
                 if index_number > self.last_frame_uploaded:
-                    self.frames.append(FacebookFrame(index_number, frame_path.resolve(strict=True)))
-            except AttributeError:
-                # doesn't match the regex: not a valid frame
-                self.logger.warning(f"File {frame_path} doesn't match the naming regex {self._frames_naming}. Bot will"
-                                    f" not load it as a frame.")
-        self.frames.sort(key=lambda frame: frame.number)
+                    indexed_frames.append((index_number, entry.path))
+        indexed_frames.sort()
+        self.frames: List[FacebookFrame] = [FacebookFrame(index_number, Path(frame_path).resolve(strict=True))
+                                            for index_number, frame_path in indexed_frames]
         if len(self.frames) == 0:
             self.total_frames_number = 0
         else:
@@ -155,25 +184,24 @@ class SimpleFrameBot(Framebot):
         :param frame_number: the index number of the frame
         :return: the post message
         """
-        return f"{self.video_title}\nFrame {frame_number} of {self.total_frames_number}"
+        return self._default_message_prefix + str(frame_number) + self._default_message_suffix
 
     def _update_last_frame_uploaded(self, number: int) -> None:
         """
         Stores the last uploaded frame number into a file for later resuming
         :param number: the latest frame uploaded's index number
         """
-        with open(self.last_frame_uploaded_file, "w") as f:
-            self.last_frame_uploaded = number
-            f.write(str(number))
+        utils.atomic_write(self.last_frame_uploaded_file, str(number).encode())
+        self.last_frame_uploaded = number
 
     def start(self) -> None:
         """
         Starts the framebot.
         """
-        for plugin in self.plugins:
+        for plugin in self._get_plugins_implementing("before_upload_loop"):
             plugin.before_upload_loop()
         self._upload_loop()
-        for plugin in self.plugins:
+        for plugin in self._get_plugins_implementing("after_upload_loop"):
             plugin.after_upload_loop()
         self.last_frame_uploaded_file.unlink()
 
@@ -182,20 +210,40 @@ class SimpleFrameBot(Framebot):
         The frame upload loop
         """
         self.logger.info("Starting upload loop.")
-        for frame in self.frames:
-            for plugin in self.plugins:
-                plugin.before_frame_upload(frame)
-            self._upload_frame(frame)
-            for plugin in self.plugins:
-                plugin.after_frame_upload(frame)
-            if self.delete_files:
-                os.remove(frame.local_file)
-            if not (frame.number == self.total_frames_number):
-                adjusted_pause = self._determine_adjusted_pause(frame)
-                self.logger.info(f"Uploaded. Waiting {adjusted_pause} seconds before the next one...")
-                time.sleep(adjusted_pause.total_seconds())
+        before_frame_upload_plugins = self._get_plugins_implementing("before_frame_upload")
+        after_frame_upload_plugins = self._get_plugins_implementing("after_frame_upload")
+        # reads the next frame from disk while the bot waits for the upload interval to pass
+        with ThreadPoolExecutor(max_workers=1) as frame_reader:
+            next_frame_content: Optional[Future] = None
+            for i, frame in enumerate(self.frames):
+                for plugin in before_frame_upload_plugins:
+                    plugin.before_frame_upload(frame)
+                frame_content = next_frame_content.result() if next_frame_content is not None else None
+                next_frame_content = None
+                self._upload_frame(frame, frame_content)
+                for plugin in after_frame_upload_plugins:
+                    plugin.after_frame_upload(frame)
+                if self.delete_files:
+                    os.remove(frame.local_file)
+                # decided on the list position, as it's also what determines which file is read next
+                if i + 1 < len(self.frames):
+                    next_frame_content = frame_reader.submit(self.frames[i + 1].local_file.read_bytes)
+                    adjusted_pause = self._determine_adjusted_pause(frame)
+                    remaining_frames = len(self.frames) - i - 1
+                    self.logger.info(f"Uploaded. {remaining_frames} frames left, estimated end in "
+                                     f"{remaining_frames * self.upload_interval}. Waiting {adjusted_pause} seconds "
+                                     f"before the next one...")
+                    time.sleep(adjusted_pause.total_seconds())
         self.logger.info("Upload loop over.")
 
+    def _get_plugins_implementing(self, hook: str) -> List[FrameBotPlugin]:
+        """
+        Gets the plugins defining a behavior for a hook, in their loading order
+        :param hook: the hook name
+        :return: the plugins implementing the hook
+        """
+        return [plugin for plugin in self.plugins if plugin.implements(hook)]
+
     def _determine_adjusted_pause(self, last_posted_frame: FacebookFrame) -> timedelta:
         """
         Determines how long the bot should wait before posting the next frame, in order to be more regular
@@ -209,15 +257,17 @@ class SimpleFrameBot(Framebot):
             return timedelta(seconds=0)
         return wanted_post_time - now
 
-    def _upload_frame(self, frame: FacebookFrame) -> None:
+    def _upload_frame(self, frame: FacebookFrame, frame_content: Optional[bytes] = None) -> None:
         """
         Uploads a single frame
         :param frame: the frame to be uploaded
+        :param frame_content: the frame file content, if it was already read from disk
         """
         self.logger.info(f"Uploading frame {frame.number} of {self.total_frames_number}...")
 
         frame.text = self._get_default_message(frame.number)
-        response = self.facebook_helper.post_photo(frame.local_file, frame.text)
+        response = self.facebook_helper.post_photo(frame.local_file if frame_content is None else frame_content,
+                                                   frame.text)
 
         frame.photo_id = response.photo_id
         frame.post_id = response.post_id
@@ -1,7 +1,9 @@
 import datetime
 import json
 import os
+import re
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 from configparser import ConfigParser
 from pathlib import Path
 from typing import Union
@@ -11,22 +13,26 @@ from slugify import slugify
 
 from ..model import FacebookFrame
 from ..plugins import BestOfReposter
-from ..utils import safe_json_dump
+from ..utils import safe_json_dump, load_config, copy_file
 from ..framebots import LAST_FRAME_UPLOADED_FILE, SimpleFrameBot
 from ..social import FacebookHelper
 
 
+# \w matches exactly the characters for which str.isalnum() is True, plus the underscore
+_OLD_ALBUM_NAME_FORBIDDEN_CHARS = re.compile(r"[^\w. -]")
+
+
 def _get_old_album_name(movie_title: str) -> str:
-    return "".join(
-        x for x in f"Bestof_{movie_title.replace(os.path.sep, '-').replace(' ', '_')}" if
-        (x.isalnum()) or x in "._- ")
+    return _OLD_ALBUM_NAME_FORBIDDEN_CHARS.sub(
+        "", f"Bestof_{movie_title.replace(os.path.sep, '-').replace(' ', '_')}")
 
 
 def backup_bof_reposter_stuff(source_dir: Union[Path, str]) -> None:
     target_backup_dir = Path(source_dir).joinpath("migration_backup")
     target_backup_dir.mkdir()
-    shutil.copy(source_dir.joinpath("bofc.json"), target_backup_dir)
-    shutil.copytree(source_dir.joinpath("albums"), target_backup_dir.joinpath("albums"))
+    copy_file(source_dir.joinpath("bofc.json"), target_backup_dir.joinpath("bofc.json"))
+    shutil.copytree(source_dir.joinpath("albums"), target_backup_dir.joinpath("albums"),
+                    copy_function=copy_file)
 
 
 def migrate_bofc_json(source_dir: Union[Path, str], target_dir: Union[Path, str], framebot: SimpleFrameBot) -> None:
@@ -40,7 +46,7 @@ def migrate_bofc_json(source_dir: Union[Path, str], target_dir: Union[Path, str]
     for frame in old_frames:
         frame_file_name = Path(frame["path"]).name
         new_frame_path = frames_to_check_path.joinpath(frame_file_name).resolve(strict=False)
-        shutil.copy(source_dir.joinpath("frames").joinpath(frame_file_name), new_frame_path)
+        copy_file(source_dir.joinpath("frames").joinpath(frame_file_name), new_frame_path)
         new_frame = FacebookFrame(
             local_file=new_frame_path,
             number=frame["frame_number"]
@@ -74,41 +80,48 @@ def migrate(source_dir: Union[Path, str], target_dir: Union[Path, str] = None):
         target_dir = source_dir
     source_dir = source_dir.absolute()
     target_dir = target_dir.absolute()
-    if target_dir == source_dir:
-        print("Backing up old files...")
-        backup_bof_reposter_stuff(source_dir)
-    else:
-        old_frames_path = source_dir.joinpath("frames")
-        new_frames_path = target_dir.joinpath("frames")
-
-        print(f"Copying frames directory from {old_frames_path} to {new_frames_path}...")
-        shutil.copytree(old_frames_path, new_frames_path)
-
-        old_config_file = source_dir.joinpath(config_file)
-        new_config_file = target_dir.joinpath(config_file)
-        print(f"Copying config file from {old_config_file} to {new_config_file}...")
-        shutil.copy(old_config_file, new_config_file)
-
-        old_last_frame_uploaded_file = source_dir.joinpath(LAST_FRAME_UPLOADED_FILE)
-        new_last_frame_uploaded_file = target_dir.joinpath(LAST_FRAME_UPLOADED_FILE)
-        print(f"Copying config file from {old_last_frame_uploaded_file} to {new_last_frame_uploaded_file}...")
-        shutil.copy(old_last_frame_uploaded_file, new_last_frame_uploaded_file)
-
-    config = ConfigParser()
-    config.read(source_dir.joinpath(config_file), encoding='utf-8')
-    movie_title = config["bot_settings"]["movie_title"]
-    framebot = _get_framebot(source_dir, config)
-
-    old_album_path = source_dir.joinpath("albums").joinpath(_get_old_album_name(movie_title))
-    plugins_dir = target_dir.joinpath("plugins")
-    bof_reposter_dir = plugins_dir.joinpath(BestOfReposter.__name__).joinpath(slugify(f"Best of {movie_title}"))
-    bof_reposter_dir.mkdir(parents=True)
-
-    print("Migrating bofc.json file and yet to check frames...")
-    migrate_bofc_json(source_dir, bof_reposter_dir, framebot)
-
-    new_album_path = bof_reposter_dir.joinpath("album")
-    print(f"Copying bof album directory from {old_album_path} to {new_album_path}...")
-    shutil.copytree(old_album_path, new_album_path)
+    # the directory copies are independent from the rest of the migration, so they run in the background
+    with ThreadPoolExecutor() as copier:
+        copies = []
+        if target_dir == source_dir:
+            print("Backing up old files...")
+            backup_bof_reposter_stuff(source_dir)
+        else:
+            old_frames_path = source_dir.joinpath("frames")
+            new_frames_path = target_dir.joinpath("frames")
+
+            print(f"Copying frames directory from {old_frames_path} to {new_frames_path}...")
+            copies.append(copier.submit(shutil.copytree, old_frames_path, new_frames_path, copy_function=copy_file))
+
+            old_config_file = source_dir.joinpath(config_file)
+            new_config_file = target_dir.joinpath(config_file)
+            print(f"Copying config file from {old_config_file} to {new_config_file}...")
+            copy_file(old_config_file, new_config_file)
+
+            old_last_frame_uploaded_file = source_dir.joinpath(LAST_FRAME_UPLOADED_FILE)
+            new_last_frame_uploaded_file = target_dir.joinpath(LAST_FRAME_UPLOADED_FILE)
+            print(f"Copying config file from {old_last_frame_uploaded_file} to {new_last_frame_uploaded_file}...")
+            copy_file(old_last_frame_uploaded_file, new_last_frame_uploaded_file)
+
+        config = load_config(source_dir.joinpath(config_file))
+        movie_title = config["bot_settings"]["movie_title"]
+        framebot = _get_framebot(source_dir, config)
+
+        old_album_path = source_dir.joinpath("albums").joinpath(_get_old_album_name(movie_title))
+        plugins_dir = target_dir.joinpath("plugins")
+        bof_reposter_dir = plugins_dir.joinpath(BestOfReposter.__name__).joinpath(slugify(f"Best of {movie_title}"))
+        bof_reposter_dir.mkdir(parents=True)
+
+        new_album_path = bof_reposter_dir.joinpath("album")
+        print(f"Copying bof album directory from {old_album_path} to {new_album_path}...")
+        copies.append(copier.submit(shutil.copytree, old_album_path, new_album_path, copy_function=copy_file))
+
+        print("Migrating bofc.json file and yet to check frames...")
+        migrate_bofc_json(source_dir, bof_reposter_dir, framebot)
+
+        print("Waiting for the directory copies to complete...")
+        for copy in copies:
+            # raises the copy errors, if any
+            copy.result()
 
     print("Done.")
@@ -20,7 +20,7 @@ class FacebookFrame(object):
         :param local_file: the local file where the image is stored
         """
         self.number: int = number
-        self.local_file: Path = local_file if type(local_file) is Path else Path(local_file)
+        self.local_file: Path = local_file if isinstance(local_file, Path) else Path(local_file)
         self.photo_id: Optional[str] = None
         self.post_id: Optional[str] = None
         self.url: Optional[str] = None
@@ -4,14 +4,15 @@ Contains implementations for framebot plugins
 from __future__ import annotations
 
 import copy
-import shutil
 import time
 import slugify
+from collections import deque
 from datetime import timedelta, datetime
 from random import random
-from typing import List, Type, Dict, Union, Callable
+from typing import List, Type, Dict, Union, Callable, Deque, Optional, FrozenSet
 
-from PIL import Image, ImageOps
+import numpy as np
+from PIL import Image, ImageOps, JpegImagePlugin
 from pyfacebook import FacebookError
 
 from pathlib import Path
@@ -23,12 +24,35 @@ from .model import FacebookFrame
 from .social import FacebookHelper
 
 
+# image modes whose NumPy array has the same layout as their raw data, so that they can be mirrored as arrays
+_NUMPY_MIRRORABLE_MODES = ("L", "LA", "RGB", "RGBA", "CMYK", "I;16", "I", "F")
+
+
+def _mirror_line(line: str) -> str:
+    """
+    Mirrors a line of text at its center
+    :param line: the line to be mirrored
+    :return: the mirrored line
+    """
+    half = len(line) // 2
+    return line[:half] + line[half::-1]
+
+
 class FrameBotPlugin(utils.LoggingObject):
     """
     A plugin to inject custom extra behavior into a framebot. It has handles for before and after the upload loop
     and the single frame posting
     """
 
+    HOOKS = ("before_upload_loop", "after_upload_loop", "before_frame_upload", "after_frame_upload")
+    # hooks overridden by the plugin class, computed once per class in __init_subclass__
+    _implemented_hooks: FrozenSet[str] = frozenset()
+
+    def __init_subclass__(cls, **kwargs) -> None:
+        super().__init_subclass__(**kwargs)
+        cls._implemented_hooks = frozenset(
+            hook for hook in FrameBotPlugin.HOOKS if getattr(cls, hook) is not getattr(FrameBotPlugin, hook))
+
     def __init__(self, depends_on: List[Type[FrameBotPlugin]] = None):
         """
         Constructor
@@ -42,6 +66,14 @@ class FrameBotPlugin(utils.LoggingObject):
         self.depends_on: List[Type[FrameBotPlugin]] = depends_on
         self.dependencies: Dict[FrameBotPlugin] = {}
 
+    def implements(self, hook: str) -> bool:
+        """
+        Checks if the plugin defines a behavior for a hook, so that the framebot can skip the no-op ones
+        :param hook: the hook name, one of HOOKS
+        :return: True if the hook is overridden by the plugin class or set on the plugin itself
+        """
+        return hook in self._implemented_hooks or hook in vars(self)
+
     def before_upload_loop(self) -> None:
         """
         Behavior to be executed before the upload loop starts.
@@ -94,6 +126,9 @@ class BestOfReposter(FileWritingFrameBotPlugin):
     post.
     """
 
+    # minimum number of journal entries after which the journal is compacted into the status file
+    MIN_JOURNAL_ENTRIES = 64
+
     def __init__(self, facebook_helper: FacebookHelper, album_id: str,
                  video_title: str, reactions_threshold: int = 50,
                  time_threshold: timedelta = timedelta(days=1),
@@ -119,7 +154,9 @@ class BestOfReposter(FileWritingFrameBotPlugin):
         normalized_video_title = slugify.slugify(f"Best of {self.video_title}")
         self.working_dir = self.working_dir.joinpath(normalized_video_title)
         self.yet_to_check_file: Path = self.working_dir.joinpath(yet_to_check_file)
-        self.yet_to_check: List[FacebookFrame] = []
+        self.journal_file: Path = self.working_dir.joinpath(f"{yet_to_check_file}.journal")
+        self._journal_entries: int = 0
+        self.yet_to_check: Deque[FacebookFrame] = deque()
         self.album_path: Path = self.working_dir.joinpath("album")
         self.frames_dir: Path = self.working_dir.joinpath("frames_to_check")
         self.store_best_ofs: bool = store_best_ofs
@@ -128,9 +165,9 @@ class BestOfReposter(FileWritingFrameBotPlugin):
                          f"a time threshold of {self.time_threshold}.")
         self.logger.info(f"Best ofs will be saved locally in the directory '{self.album_path}' and "
                          f"reuploaded in the album with id {self.album_id}.")
-        os.makedirs(self.working_dir, exist_ok=True)
-        os.makedirs(self.album_path, exist_ok=True)
-        os.makedirs(self.frames_dir, exist_ok=True)
+        # the album directory creation also creates the working directory
+        self.album_path.mkdir(parents=True, exist_ok=True)
+        self.frames_dir.mkdir(exist_ok=True)
 
     def _check_for_existing_status(self) -> None:
         """
@@ -139,35 +176,112 @@ class BestOfReposter(FileWritingFrameBotPlugin):
         if os.path.exists(self.yet_to_check_file):
             self.logger.info(f"Found existing {self.yet_to_check_file} file for best of checks, "
                              f"trying to load it...")
-            self.yet_to_check: List[FacebookFrame] = utils.load_obj_from_json_file(self.yet_to_check_file)
-            self.yet_to_check.sort(key=lambda yet_to_check_frame: yet_to_check_frame.post_time)
+            yet_to_check: List[FacebookFrame] = utils.load_obj_from_json_file(self.yet_to_check_file)
+            yet_to_check.sort(key=lambda yet_to_check_frame: yet_to_check_frame.post_time)
+            self.yet_to_check = deque(yet_to_check)
+        if os.path.exists(self.journal_file):
+            self.logger.info(f"Found existing {self.journal_file} file for best of checks, replaying it...")
+            self._replay_journal(utils.load_json_lines(self.journal_file))
+            self._store_status()
+
+    def _replay_journal(self, entries: List[Dict]) -> None:
+        """
+        Applies the journal entries to the queue. Replaying is idempotent, so entries already included in the status
+        file, left by an abrupt termination during a compaction, are harmless
+        :param entries: the journal entries, in the order they were appended
+        """
+        queued_post_ids = {frame.post_id for frame in self.yet_to_check}
+        for entry in entries:
+            if "added" in entry:
+                frame = entry["added"]
+                if frame.post_id not in queued_post_ids:
+                    self.yet_to_check.append(frame)
+                    queued_post_ids.add(frame.post_id)
+            else:
+                removed_post_ids = set(entry["removed"])
+                self.yet_to_check = deque(frame for frame in self.yet_to_check
+                                          if frame.post_id not in removed_post_ids)
+                queued_post_ids -= removed_post_ids
+
+    def _store_status(self) -> None:
+        """
+        Stores the frames yet to check into the status file, for later restarts, and empties the journal.
+        """
+        utils.safe_json_dump(self.yet_to_check_file, list(self.yet_to_check))
+        if os.path.exists(self.journal_file):
+            os.remove(self.journal_file)
+        self._journal_entries = 0
+
+    def _append_to_journal(self, entry: Dict) -> None:
+        """
+        Appends a change of the queue to the journal, so that it's not required to rewrite the whole status file for
+        every queued or checked frame. The journal is compacted into the status file once it's longer than the queue
+        :param entry: the change, either {"added": frame} or {"removed": [post ids]}
+        """
+        utils.append_json_line(self.journal_file, entry)
+        self._journal_entries += 1
+        if self._journal_entries > max(self.MIN_JOURNAL_ENTRIES, len(self.yet_to_check)):
+            self._store_status()
 
     def _advance_bests(self) -> None:
         """
         Checks if there are frames to repost into the best-of album, and posts them if so.
         """
         self.logger.info(f"Checking for best of reuploading...")
+        checked_post_ids = []
+        # a single time reference for the whole check round
+        now = datetime.now()
         try:
-            while len(self.yet_to_check) > 0 and (self._check_and_post(self.yet_to_check[0])):
-                self.yet_to_check.pop(0)
-                utils.safe_json_dump(self.yet_to_check_file, self.yet_to_check)
+            reactions_total_counts = self._get_due_reactions_total_counts(now)
+            while len(self.yet_to_check) > 0 and (self._check_and_post(
+                    self.yet_to_check[0], reactions_total_counts.get(self.yet_to_check[0].post_id), now)):
+                checked_post_ids.append(self.yet_to_check.popleft().post_id)
         except FacebookError:
             self.logger.warning("There was a problem during the check of best-ofs", exc_info=True)
+        finally:
+            # journal the removal once for all the checked frames, instead of once per frame
+            if len(checked_post_ids) > 0:
+                self._append_to_journal({"removed": checked_post_ids})
         self.logger.info("Done checking for best-ofs.")
 
-    def _check_and_post(self, frame: FacebookFrame) -> bool:
+    def _get_due_reactions_total_counts(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Gathers with batched requests the reactions count of all the queued frames whose time threshold has passed
+        :param now: the time to compare the frames post time with. Defaults to the current time
+        :return: the reactions count for each due frame post id
+        """
+        if now is None:
+            now = datetime.now()
+        due_post_ids = []
+        # the queue is ordered by post time, so the due frames are all at its head
+        for frame in self.yet_to_check:
+            if now - frame.post_time < self.time_threshold:
+                break
+            if os.path.exists(frame.local_file):
+                due_post_ids.append(frame.post_id)
+        if len(due_post_ids) == 0:
+            return {}
+        return self.facebook_helper.get_reactions_total_counts(due_post_ids)
+
+    def _check_and_post(self, frame: FacebookFrame, reactions_total: Optional[int] = None,
+                        now: Optional[datetime] = None) -> bool:
         """
         Checks if the time threshold time has passed, then checks the reactions count against the threshold,
         and if so, reuploads the frame in the best-of album
         :param frame: the frame to be checked
+        :param reactions_total: the frame reactions count, if already known
+        :param now: the time to compare the frame post time with. Defaults to the current time
         :return: True if the frame has been checked, False if it's still too early
         """
-        elapsed_time = datetime.now() - frame.post_time
+        if now is None:
+            now = datetime.now()
+        elapsed_time = now - frame.post_time
         if elapsed_time < self.time_threshold:
             return False
         self.logger.info(f"Checking entry {frame}...")
         if os.path.exists(frame.local_file):
-            reactions_total = self.facebook_helper.get_reactions_total_count(frame.post_id)
+            if reactions_total is None:
+                reactions_total = self.facebook_helper.get_reactions_total_count(frame.post_id)
             if reactions_total > self.reactions_threshold:
                 self.logger.info(f"Uploading frame {frame.local_file} to best of album...")
                 message = f"Reactions after {int(elapsed_time.total_seconds() / 3600)} hours : " \
@@ -175,7 +289,7 @@ class BestOfReposter(FileWritingFrameBotPlugin):
                           f"Original post: {frame.url}\n\n" + \
                           frame.text
                 self.facebook_helper.post_photo(frame.local_file, message, self.album_id)
-                shutil.copyfile(frame.local_file,
+                utils.copy_file(frame.local_file,
                                 os.path.join(self.album_path,
                                              f"Frame {frame.number} "
                                              f"post_id {frame.post_id} "
@@ -196,10 +310,19 @@ class BestOfReposter(FileWritingFrameBotPlugin):
         frame = copy.copy(frame)
         # copy frame to temp dir
         new_file_path = self.frames_dir.joinpath(frame.local_file.name).resolve(strict=False)
-        shutil.copyfile(frame.local_file, new_file_path)
+        utils.copy_file(frame.local_file, new_file_path)
         frame.local_file = new_file_path
         self.yet_to_check.append(frame)
-        utils.safe_json_dump(self.yet_to_check_file, self.yet_to_check)
+        self._append_to_journal({"added": frame})
+
+    def _is_check_due(self) -> bool:
+        """
+        Checks if the oldest queued frame has passed the time threshold. The queue is ordered by post time, so if it
+        hasn't, no other frame has either
+        :return: True if there's at least one frame to be checked
+        """
+        return len(self.yet_to_check) > 0 and \
+            datetime.now() - self.yet_to_check[0].post_time >= self.time_threshold
 
     def _handle_quicker(self) -> None:
         """
@@ -219,7 +342,8 @@ class BestOfReposter(FileWritingFrameBotPlugin):
         self._check_for_existing_status()
 
     def before_frame_upload(self, frame: FacebookFrame) -> None:
-        self._advance_bests()
+        if self._is_check_due():
+            self._advance_bests()
 
     def after_frame_upload(self, frame: FacebookFrame) -> None:
         self._queue_frame_for_check(frame)
@@ -257,16 +381,43 @@ class MirroredFramePoster(FrameBotPlugin):
         self.logger.info(f"Random mirroring is enabled with ratio {self.ratio}. Mirrored frames will be "
                          f"posted to the album with id {self.album_id}.")
 
+    @property
+    def ratio(self) -> float:
+        return self._ratio
+
+    @ratio.setter
+    def ratio(self, ratio: float) -> None:
+        self._ratio = ratio
+        # precomputed so that the per-frame check is a single comparison
+        self._mirror_probability = ratio / 100
+
     def _mirror_frame(self, frame: FacebookFrame) -> Image:
         """
         Mirrors a frame and returns it
         :param frame: Frame to be mirrored
         :return the mirrored frame
         """
-        im = Image.open(frame.local_file)
-        flipped_half = ImageOps.mirror(im.crop((0, 0, im.size[0] // 2, im.size[1])))
-        im.paste(flipped_half, (im.size[0] // 2, 0))
-        return im
+        with Image.open(frame.local_file) as im:
+            if im.mode in _NUMPY_MIRRORABLE_MODES:
+                # np.asarray would give a read-only view on the decoded image, so take a single writable copy
+                pixels = np.array(im)
+                half = pixels.shape[1] // 2
+                # the right half becomes the left half reversed, in a single strided copy
+                pixels[:, half:2 * half] = pixels[:, half - 1::-1]
+                # rebuilt with the source mode, as inferring it from the array shape would turn e.g. CMYK into RGBA
+                mirrored = Image.frombuffer(im.mode, im.size, pixels, "raw", im.mode, 0, 1)
+                mirrored.info = im.info.copy()
+            else:
+                # e.g. bilevel or palette images, whose array layout doesn't match their raw one
+                mirrored = im.copy()
+                half = im.size[0] // 2
+                mirrored.paste(ImageOps.mirror(im.crop((0, 0, half, im.size[1]))), (half, 0))
+            quantization = getattr(im, "quantization", None)
+            subsampling = JpegImagePlugin.get_sampling(im)
+        # keep the source quantization tables and subsampling, so the mirrored frame is encoded like the original one
+        mirrored.quantization = quantization
+        mirrored.subsampling = subsampling
+        return mirrored
 
     def _generate_message(self, frame: FacebookFrame) -> str:
         """
@@ -274,18 +425,15 @@ class MirroredFramePoster(FrameBotPlugin):
         :param frame: the frame to be mirrored
         :return: the generated message
         """
-        lines = frame.text.split("\n")
-        message = ""
+        message_parts = []
         if self.mirror_original_message:
-            message += "\n".join([line[:len(line) // 2] + line[len(line) // 2::-1] for line in lines])
+            message_parts.append("\n".join([_mirror_line(line) for line in frame.text.split("\n")]))
         if self.extra_message != "":
-            if self.mirror_original_message:
-                message += "\n\n"
-            message += self.extra_message
-        return message
+            message_parts.append(self.extra_message)
+        return "\n\n".join(message_parts)
 
     def after_frame_upload(self, frame: FacebookFrame) -> None:
-        if random() >= (1 - self.ratio / 100):
+        if random() < self._mirror_probability:
             self.logger.info("Posting mirrored frame...")
             mirrored_frame = self._mirror_frame(frame)
             frame_text = self._generate_message(frame)
@@ -6,13 +6,17 @@ from contextlib import contextmanager
 from datetime import timedelta
 from io import BytesIO
 from pathlib import Path
-from typing import Union, Dict
+from random import uniform
+from typing import Union, Dict, List
 
 from pyfacebook import GraphAPI, FacebookError
+from PIL import JpegImagePlugin
 from PIL.Image import Image
 
 from .utils import LoggingObject
 
+JPEG_DEFAULT_QUALITY = 85
+
 
 class FacebookPostPhotoResponse:
 
@@ -42,6 +46,8 @@ class FacebookHelper(LoggingObject):
     """
     DEFAULT_RETRY_MINUTES = timedelta(minutes=1)
     DEFAULT_MAX_RETRIES = 5
+    MAX_RETRY_TIME = timedelta(minutes=30)
+    MAX_BATCH_SIZE = 50
 
     def __init__(self, access_token: str, page_id: str, timeout: timedelta = timedelta(seconds=20)):
         """
@@ -59,14 +65,14 @@ class FacebookHelper(LoggingObject):
 
         self.logger.info(f"Initialized GraphAPI for Facebook. Page id is {self.page_id}.")
 
-    def post_photo(self, image: Union[Path, str, Image], message: str, album_id: str = None,
+    def post_photo(self, image: Union[Path, str, Image, bytes], message: str, album_id: str = None,
                    max_retries: int = DEFAULT_MAX_RETRIES, retry_time: timedelta = DEFAULT_RETRY_MINUTES) \
             -> FacebookPostPhotoResponse:
         """
         Uploads a photo to a specific album, or to the news feed if no album id is specified
-        :param retry_time: time to wait if a failure occurs, before the next retry
+        :param retry_time: base time to wait if a failure occurs, before the next retry. Doubles at every retry
         :param max_retries: max number of retries before giving up
-        :param image: The image to be posted. Could be a path to an image file or a PIL Image
+        :param image: The image to be posted. Could be a path to an image file, a PIL Image or the image file content
         :param message: The message used as image description
         :param album_id: The album where to post the image
         :return the response object containing photo id and post id
@@ -83,7 +89,7 @@ class FacebookHelper(LoggingObject):
                      max_retries: int = DEFAULT_MAX_RETRIES, retry_time: timedelta = DEFAULT_RETRY_MINUTES) -> str:
         """
         Uploads a comment to a specific post. At least one between image and message must not be None.
-        :param retry_time: time to wait if a failure occurs, before the next retry
+        :param retry_time: base time to wait if a failure occurs, before the next retry. Doubles at every retry
         :param max_retries: max number of retries before giving up
         :param image: The image to be posted. Could be a path to an image file or a PIL Image, or None
         :param message: The comment message, if any
@@ -107,8 +113,23 @@ class FacebookHelper(LoggingObject):
 
     def _post_with_retry(self, object_id: str, connection: str, files: Dict = None, data: Dict = None,
                          max_retries: int = DEFAULT_MAX_RETRIES, retry_time: timedelta = DEFAULT_RETRY_MINUTES) -> Dict:
+        """
+        Posts an object, retrying with a capped exponential backoff with full jitter in case of failure
+        :param object_id: the id of the object to post to
+        :param connection: the object connection to post to
+        :param files: files to be posted
+        :param data: data to be posted
+        :param max_retries: max number of retries before giving up
+        :param retry_time: base time to wait if a failure occurs, before the next retry. Doubles at every retry
+        :return: the api response
+        """
         retry_count = 0
         while True:
+            if retry_count > 0 and files is not None:
+                # the failed attempt may have consumed the streams: rewind them instead of copying their content
+                for file in files.values():
+                    if hasattr(file, "seek"):
+                        file.seek(0)
             try:
                 return self.graph.post_object(object_id=object_id, connection=connection, files=files, data=data)
             except FacebookError as e:
@@ -117,8 +138,11 @@ class FacebookHelper(LoggingObject):
                     raise e
                 self.logger.warning("Exception occurred during photo upload.", exc_info=True)
                 if retry_count < max_retries:
-                    retry_secs = retry_time.total_seconds() if "spam" not in str(e) else retry_time.total_seconds() * 10
-                    self.logger.warning(f"Retrying photo upload after {retry_secs} seconds.")
+                    base_secs = retry_time.total_seconds() if "spam" not in str(e) else retry_time.total_seconds() * 10
+                    max_secs = min(self.MAX_RETRY_TIME.total_seconds(), base_secs * 2 ** retry_count)
+                    # full jitter: spreads the retries out instead of hitting the api again at fixed times
+                    retry_secs = uniform(0, max_secs)
+                    self.logger.warning(f"Retrying photo upload after {retry_secs:.1f} seconds.")
                     time.sleep(retry_secs)
                 else:
                     self.logger.error("Unable to post even after several retries. Check what's happening.")
@@ -141,6 +165,36 @@ class FacebookHelper(LoggingObject):
                 return self.get_reactions_total_count(self._get_story_id(post_id))
             raise e
 
+    def get_reactions_total_counts(self, post_ids: List[str]) -> Dict[str, int]:
+        """
+        Gathers the total reactions count for several posts, requesting up to MAX_BATCH_SIZE posts per api call
+        :param post_ids: the posts' story ids
+        :return: the total reaction count for each post id. Posts whose count could not be retrieved are missing
+        """
+        reactions_total_counts = {}
+        for i in range(0, len(post_ids), self.MAX_BATCH_SIZE):
+            batch = post_ids[i:i + self.MAX_BATCH_SIZE]
+            try:
+                # the graph api expects the ids as a single comma separated parameter
+                response = self.graph.get_objects(ids=",".join(batch), fields="reactions.summary(total_count)")
+            except FacebookError as e:
+                if e.code == 100:  # at least one photo id from an old version of the bot, the whole batch fails
+                    self.logger.warning("Batch reactions request failed because of a photo id. Falling back to single"
+                                        " requests for this batch.")
+                    for post_id in batch:
+                        try:
+                            reactions_total_counts[post_id] = self.get_reactions_total_count(post_id)
+                        except FacebookError:
+                            # e.g. a deleted post. Left out, so that it's queried again (or fails) only when its
+                            # own turn in the best-of queue comes
+                            self.logger.warning(f"Could not get the reactions count for post {post_id}.",
+                                                exc_info=True)
+                    continue
+                raise e
+            reactions_total_counts.update(
+                {post_id: post["reactions"]["summary"]["total_count"] for post_id, post in response.items()})
+        return reactions_total_counts
+
     def _get_story_id(self, object_id: str) -> str:
         """
         Returns the story id for a given post. Here for compatibility reasons after code changes.
@@ -150,14 +204,39 @@ class FacebookHelper(LoggingObject):
         return self.graph.get_object(object_id=object_id, fields="page_story_id")["page_story_id"]
 
 
+def _get_jpeg_save_options(image: Image) -> Dict:
+    """
+    Determines the jpeg encoder options for an image. The source quantization tables and chroma subsampling are
+    reused when known, so that re-encoding a jpeg frame doesn't degrade it further
+    :param image: the image to be encoded
+    :return: the encoder options
+    """
+    options = {"optimize": False, "progressive": False}
+    quantization = getattr(image, "quantization", None)
+    if quantization:
+        options["qtables"] = quantization
+    else:
+        options["quality"] = JPEG_DEFAULT_QUALITY
+    subsampling = getattr(image, "subsampling", None)
+    if subsampling is None:
+        # -1 if the image wasn't decoded from a jpeg
+        subsampling = JpegImagePlugin.get_sampling(image)
+    if subsampling >= 0:
+        options["subsampling"] = subsampling
+    return options
+
+
 @contextmanager
-def open_image_stream(image: Union[Path, str, Image]) -> Union[bytes, BytesIO]:
-    if issubclass(type(image), (str, Path)):
+def open_image_stream(image: Union[Path, str, Image, bytes]) -> Union[bytes, BytesIO]:
+    if isinstance(image, (str, Path)):
         im_stream = open(image, "rb")
         output = im_stream
+    elif isinstance(image, bytes):
+        im_stream = BytesIO(image)
+        output = im_stream
     else:
         im_stream = BytesIO()
-        image.save(im_stream, "jpeg")
+        image.save(im_stream, "jpeg", **_get_jpeg_save_options(image))
         im_stream.seek(0)
         output = im_stream
     try:
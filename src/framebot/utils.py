@@ -1,12 +1,102 @@
+import json
 import logging
+import os
 import shutil
+import stat
 import sys
+import tempfile
+from configparser import ConfigParser
 from logging import Logger
 from pathlib import Path
-from typing import Union, Any
+from typing import Union, Any, List
 
 import jsonpickle
 
+if sys.platform == "darwin":
+    import fcntl
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# the process umask, read once at import as it can only be read by changing it, which isn't thread safe
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def _json_dumps(obj: Any, indent: bool = True) -> bytes:
+    """
+    Encodes an already flattened object to json, using orjson if it's available
+    :param obj: the object to be encoded
+    :param indent: if False, the json is encoded on a single line
+    :return: the encoded json
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else None)
+    return json.dumps(obj, indent=4 if indent else None).encode("utf-8")
+
+
+def _json_loads(json_bytes: bytes) -> Any:
+    """
+    Decodes a json document, using orjson if it's available
+    :param json_bytes: the json to be decoded
+    :return: the decoded (still flattened) object
+    """
+    if orjson is not None:
+        return orjson.loads(json_bytes)
+    return json.loads(json_bytes)
+
+
+def _fsync(fd: int) -> None:
+    """
+    Flushes a file to disk
+    :param fd: the file descriptor
+    """
+    if sys.platform == "darwin":
+        # on macOS fsync only hands the data to the drive, which may keep it in its volatile cache
+        try:
+            fcntl.fcntl(fd, fcntl.F_FULLFSYNC)
+            return
+        except OSError:
+            # not supported by some filesystems, e.g. network shares and some FUSE mounts
+            pass
+    os.fsync(fd)
+
+
+def atomic_write(fpath: Union[str, Path], content: bytes) -> None:
+    """
+    Writes a file so that an abrupt termination of the script leaves either its old or its new content, never a
+    partial or empty one. The content goes to a temporary file in the same directory, is flushed to disk and is then
+    renamed over the target. The file keeps the target's permissions if it already exists, or gets the default ones
+    for a new file otherwise
+    :param fpath: path of the file to be written
+    :param content: the content to be written
+    """
+    if issubclass(type(fpath), Path):
+        fpath = str(fpath)
+    try:
+        mode = stat.S_IMODE(os.stat(fpath).st_mode)
+    except FileNotFoundError:
+        mode = 0o666 & ~_UMASK
+    # the temporary file is created next to the target, so the final rename never crosses filesystems
+    fd, safe_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(fpath)),
+                                     prefix=os.path.basename(fpath), suffix="_safe")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            # mkstemp creates owner-only files
+            os.chmod(safe_path, mode)
+            f.write(content)
+            f.flush()
+            _fsync(f.fileno())
+        # atomic rename on the same filesystem
+        os.replace(safe_path, fpath)
+    except BaseException:
+        if os.path.exists(safe_path):
+            os.remove(safe_path)
+        raise
+
 
 def safe_json_dump(fpath: Union[str, Path], obj: Any) -> None:
     """
@@ -14,13 +104,8 @@ def safe_json_dump(fpath: Union[str, Path], obj: Any) -> None:
     :param fpath: path where the json has to be saved
     :param obj: the content to be saved
     """
-    if issubclass(type(fpath), Path):
-        fpath = str(fpath)
-    safe_path = fpath + "_safe"
-    with open(safe_path, "w") as f:
-        json_str = jsonpickle.dumps(obj, indent=4)
-        f.write(json_str)
-    shutil.move(safe_path, fpath)
+    # jsonpickle only flattens the objects, the actual encoding is done by the faster json backend
+    atomic_write(fpath, _json_dumps(jsonpickle.Pickler().flatten(obj)))
 
 
 def load_obj_from_json_file(fpath: Union[str, Path]) -> Any:
@@ -29,12 +114,101 @@ def load_obj_from_json_file(fpath: Union[str, Path]) -> Any:
     :param fpath:
     :return:
     """
-    with open(fpath, "r") as f:
-        str_result = f.read()
-        result = jsonpickle.decode(str_result)
+    with open(fpath, "rb") as f:
+        result = jsonpickle.Unpickler().restore(_json_loads(f.read()))
     return result
 
 
+def append_json_line(fpath: Union[str, Path], obj: Any) -> None:
+    """
+    Appends an object as a single json line to a file and flushes it to disk. Used for append-only journals, whose
+    writes cost the size of the entry rather than the size of the whole file
+    :param fpath: path of the file to be appended to
+    :param obj: the object to be appended
+    """
+    with open(fpath, "ab") as f:
+        f.write(_json_dumps(jsonpickle.Pickler().flatten(obj), indent=False) + b"\n")
+        f.flush()
+        _fsync(f.fileno())
+
+
+def load_json_lines(fpath: Union[str, Path]) -> List[Any]:
+    """
+    Loads the objects appended to a file by append_json_line. An incomplete last line, left by an abrupt termination
+    of the script while appending, is ignored
+    :param fpath: path of the file to be loaded
+    :return: the loaded objects, in the order they were appended
+    """
+    result = []
+    with open(fpath, "rb") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                result.append(jsonpickle.Unpickler().restore(_json_loads(line)))
+            except ValueError:
+                break
+    return result
+
+
+# buffer size for the copies done in user space, the same shutil uses on Windows
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+def _copy_file_range(src: Union[str, Path], dst: Union[str, Path]) -> bool:
+    """
+    Copies a file's content with copy_file_range, so that the data never goes through user space
+    :param src: path of the file to be copied
+    :param dst: path of the copy
+    :return: True if the whole file was copied, False if the kernel or the filesystems don't support it
+    """
+    try:
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            remaining = os.fstat(fsrc.fileno()).st_size
+            while remaining > 0:
+                copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                if copied == 0:
+                    # some filesystems silently copy nothing instead of failing
+                    return False
+                remaining -= copied
+    except OSError:
+        return False
+    return True
+
+
+def copy_file(src: Union[str, Path], dst: Union[str, Path]) -> None:
+    """
+    Copies a file's content, letting the kernel copy it (or clone it, on filesystems supporting reflinks) where
+    copy_file_range is available, i.e. on Linux with Python 3.8+, and falling back to shutil otherwise
+    :param src: path of the file to be copied
+    :param dst: path of the copy
+    :raises shutil.SameFileError: if src and dst are the same file, as shutil.copyfile does
+    """
+    # checked before dst is opened for writing, which would truncate src as well
+    if os.path.exists(dst) and os.path.samefile(src, dst):
+        raise shutil.SameFileError(f"{src!r} and {dst!r} are the same file")
+    if hasattr(os, "copy_file_range") and _copy_file_range(src, dst):
+        return
+    if sys.version_info < (3, 8):
+        # before 3.8 shutil.copyfile always copies through a 16 KiB buffer
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            shutil.copyfileobj(fsrc, fdst, COPY_BUFFER_SIZE)
+    else:
+        # sendfile on Linux, fcopyfile on macOS and a 1 MiB buffer on Windows
+        shutil.copyfile(src, dst)
+
+
+def load_config(config_path: Union[str, Path]) -> ConfigParser:
+    """
+    Loads a framebot configuration file
+    :param config_path: path of the config.ini file
+    :return: the parsed configuration
+    """
+    config = ConfigParser()
+    config.read(config_path, encoding="utf-8")
+    return config
+
+
 def get_logger(name: str, level: int = logging.INFO) -> Logger:
     """
 
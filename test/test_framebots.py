@@ -6,7 +6,7 @@ import unittest
 from datetime import timedelta, datetime
 from distutils.dir_util import copy_tree
 from pathlib import Path
-from unittest.mock import Mock, patch, mock_open
+from unittest.mock import Mock, patch, mock_open, call
 
 from framebot.framebots import SimpleFrameBot, _get_filename
 from framebot.model import FacebookFrame
@@ -143,6 +143,12 @@ class TestSimpleFrameBot(FileWritingTestCase):
         with open(test_last_frame_uploaded_path) as f:
             self.assertEqual(str(test_last_frame_uploaded), f.read())
 
+        # the file is overwritten, not appended to
+        test_last_frame_uploaded = 9
+        self.testee._update_last_frame_uploaded(test_last_frame_uploaded)
+        with open(test_last_frame_uploaded_path) as f:
+            self.assertEqual(str(test_last_frame_uploaded), f.read())
+
     def test_start(self):
         self.testee.plugins.append(self.mock_plugin)
         self.testee._upload_loop = Mock()
@@ -155,6 +161,13 @@ class TestSimpleFrameBot(FileWritingTestCase):
         self.mock_plugin.before_upload_loop.assert_called_once()
         self.mock_plugin.after_upload_loop.assert_called_once()
 
+    def test_get_plugins_implementing(self):
+        no_op_plugin = Mock(spec=FrameBotPlugin)
+        no_op_plugin.implements.return_value = False
+        self.testee.plugins = [self.mock_plugin, no_op_plugin]
+        self.assertEqual([self.mock_plugin], self.testee._get_plugins_implementing("after_frame_upload"))
+        no_op_plugin.implements.assert_called_once_with("after_frame_upload")
+
     @patch("os.remove")
     def test_upload_loop(self, mock_remove: Mock):
         self.testee.plugins.append(self.mock_plugin)
@@ -166,9 +179,16 @@ class TestSimpleFrameBot(FileWritingTestCase):
         self.testee._init_frames()
         frames_number = self.testee.total_frames_number
         self.assertGreater(frames_number, 0)
+        for frame in self.testee.frames:
+            frame.local_file.write_bytes(frame.local_file.name.encode())
 
         self.testee._upload_loop()
         self.assertEqual(frames_number, self.testee._upload_frame.call_count)
+        # every frame is posted with its own content, read ahead except for the first one
+        self.assertEqual(
+            [call(frame, None if i == 0 else frame.local_file.name.encode()) for i, frame in
+             enumerate(self.testee.frames)],
+            self.testee._upload_frame.call_args_list)
         self.assertEqual(frames_number, self.mock_plugin.before_frame_upload.call_count)
         self.assertEqual(frames_number, self.mock_plugin.after_frame_upload.call_count)
         mock_remove.assert_not_called()
@@ -179,6 +199,21 @@ class TestSimpleFrameBot(FileWritingTestCase):
         self.testee._upload_loop()
         self.assertEqual(frames_number, mock_remove.call_count)
 
+        # two files parsing to the last frame number, each posted with its own content
+        last_frame_file = self.testee.frames[-1].local_file
+        duplicate_frame_file = last_frame_file.with_name(f"0{last_frame_file.name}")
+        duplicate_frame_file.write_bytes(duplicate_frame_file.name.encode())
+        self.testee._upload_frame.reset_mock()
+        self.testee.delete_files = False
+        self.testee.last_frame_uploaded = -1
+        self.testee._init_frames()
+        self.assertEqual(frames_number + 1, len(self.testee.frames))
+        self.testee._upload_loop()
+        self.assertEqual(
+            [call(frame, None if i == 0 else frame.local_file.name.encode()) for i, frame in
+             enumerate(self.testee.frames)],
+            self.testee._upload_frame.call_args_list)
+
     def test_upload_frame(self):
         test_frame = FacebookFrame(number=1, local_file="dummy.jpg")
         self.testee._upload_frame(test_frame)
@@ -189,6 +224,12 @@ class TestSimpleFrameBot(FileWritingTestCase):
         self.assertEqual(test_frame.number, self.testee.last_frame_uploaded)
         self.mock_helper.post_photo.assert_called_once_with(test_frame.local_file, test_frame.text)
 
+        # frame content already read
+        self.mock_helper.post_photo.reset_mock()
+        frame_content = b"frame content"
+        self.testee._upload_frame(test_frame, frame_content)
+        self.mock_helper.post_photo.assert_called_once_with(frame_content, test_frame.text)
+
     @patch("framebot.framebots.datetime", spec=datetime)
     def test_determine_adjusted_pause(self, mock_datetime: Mock):
         fake_now = datetime(year=2020, month=1, day=1)
@@ -1,8 +1,10 @@
+import copy
 import datetime
 import inspect
 import shutil
 import unittest
 import os
+from collections import deque
 from datetime import timedelta, datetime
 from pathlib import Path
 from typing import Callable
@@ -10,16 +12,38 @@ from unittest import TestCase
 from unittest.mock import Mock, patch, DEFAULT
 from pyfacebook import FacebookError
 
-from PIL import Image, ImageOps
+from PIL import Image, ImageOps, JpegImagePlugin
 from framebot import utils
 
 from framebot.model import FacebookFrame
-from framebot.plugins import BestOfReposter, MirroredFramePoster, FileWritingFrameBotPlugin, AlternateFrameCommentPoster
-from framebot.social import FacebookHelper
+from framebot.plugins import BestOfReposter, MirroredFramePoster, FileWritingFrameBotPlugin, \
+    AlternateFrameCommentPoster, FrameBotPlugin
+from framebot.social import FacebookHelper, open_image_stream
 from test import RESOURCES_DIR
 from test.utils_for_tests import FileWritingTestCase, generate_test_frame
 
 
+class TestFrameBotPlugin(TestCase):
+
+    def test_implements(self):
+        testee = FrameBotPlugin()
+        for hook in FrameBotPlugin.HOOKS:
+            self.assertFalse(testee.implements(hook))
+        # hook set on the instance
+        testee.after_frame_upload = Mock()
+        self.assertTrue(testee.implements("after_frame_upload"))
+
+        self.assertEqual(set(FrameBotPlugin.HOOKS), BestOfReposter._implemented_hooks)
+        self.assertEqual({"after_frame_upload"}, MirroredFramePoster._implemented_hooks)
+        self.assertEqual(frozenset(), FileWritingFrameBotPlugin._implemented_hooks)
+
+        class SubclassPlugin(MirroredFramePoster):
+            def before_upload_loop(self) -> None:
+                pass
+
+        self.assertEqual({"before_upload_loop", "after_frame_upload"}, SubclassPlugin._implemented_hooks)
+
+
 class TestFileWritingFrameBotPlugin(FileWritingTestCase):
 
     def test_init(self):
@@ -66,11 +90,46 @@ class TestBestOfReposter(FileWritingTestCase):
         self.assertEqual(len(self.test_frames), len(self.testee.yet_to_check))
         for frame in self.testee.yet_to_check:
             self.assertEqual(FacebookFrame, type(frame))
-        self.assertEqual(self.test_frames, self.testee.yet_to_check)
+        self.assertEqual(self.test_frames, list(self.testee.yet_to_check))
         self.assertTrue(all(self.testee.yet_to_check[i].post_time < self.testee.yet_to_check[i + 1].post_time
                             for i in range(len(self.testee.yet_to_check) - 1)))
 
-    @patch("shutil.copyfile")
+        # journal replayed on top of the status file, and compacted into it
+        self.test_frame.post_id = "post_id4"
+        utils.append_json_line(self.testee.journal_file, {"removed": [self.test_frames[0].post_id]})
+        utils.append_json_line(self.testee.journal_file, {"added": self.test_frame})
+        self.testee._check_for_existing_status()
+        expected_frames = self.test_frames[1:] + [self.test_frame]
+        self.assertEqual(expected_frames, list(self.testee.yet_to_check))
+        self.assertFalse(self.testee.journal_file.exists())
+        self.assertEqual(expected_frames, utils.load_obj_from_json_file(self.testee.yet_to_check_file))
+
+    def test_replay_journal(self):
+        self.testee.yet_to_check = deque(self.test_frames)
+        self.test_frame.post_id = "post_id4"
+        journal = [{"removed": [self.test_frames[0].post_id]}, {"added": self.test_frame}]
+        expected_frames = self.test_frames[1:] + [self.test_frame]
+        self.testee._replay_journal(journal)
+        self.assertEqual(expected_frames, list(self.testee.yet_to_check))
+        # replaying entries already applied changes nothing
+        self.testee._replay_journal(journal)
+        self.assertEqual(expected_frames, list(self.testee.yet_to_check))
+
+    @patch("framebot.utils.safe_json_dump")
+    @patch("framebot.utils.append_json_line")
+    def test_append_to_journal(self, mock_append: Mock, mock_json_dump: Mock):
+        self.testee.yet_to_check = deque(self.test_frames)
+        entry = {"removed": ["post_id0"]}
+        for _ in range(self.testee.MIN_JOURNAL_ENTRIES):
+            self.testee._append_to_journal(entry)
+        mock_append.assert_called_with(self.testee.journal_file, entry)
+        mock_json_dump.assert_not_called()
+        # journal compacted once too long
+        self.testee._append_to_journal(entry)
+        mock_json_dump.assert_called_once_with(self.testee.yet_to_check_file, list(self.testee.yet_to_check))
+        self.assertEqual(0, self.testee._journal_entries)
+
+    @patch("framebot.utils.copy_file")
     @patch("os.remove")
     def test_check_and_post(self, mock_remove: Mock, mock_copyfile: Mock):
         # too early
@@ -91,6 +150,14 @@ class TestBestOfReposter(FileWritingTestCase):
             self.assertFalse(mock_copyfile.called)
             mock_exists.assert_called_once_with(self.test_frame.local_file)
 
+            # reactions count already known
+            self.facebook_helper.get_reactions_total_count.reset_mock()
+            mock_remove.reset_mock()
+            mock_exists.reset_mock()
+            self.assertTrue(self.testee._check_and_post(self.test_frame, reactions))
+            self.facebook_helper.get_reactions_total_count.assert_not_called()
+            self.assertFalse(self.facebook_helper.post_photo.called)
+
             # best of eligible
             self.testee.reactions_threshold = 98
             mock_remove.reset_mock()
@@ -112,16 +179,39 @@ class TestBestOfReposter(FileWritingTestCase):
             self.assertTrue(self.testee._check_and_post(self.test_frame))
             mock_exists.assert_called_once_with(self.test_frame.local_file)
 
-    @patch("framebot.utils.safe_json_dump")
+    def test_get_due_reactions_total_counts(self):
+        self.testee.time_threshold = timedelta(days=1)
+        due_frames = [copy.copy(self.test_frame) for _ in range(2)]
+        for i, frame in enumerate(due_frames):
+            frame.post_id = f"due_{i}"
+            frame.post_time = datetime.now() - timedelta(days=2)
+        young_frame = copy.copy(self.test_frame)
+        young_frame.post_id = "young"
+        self.testee.yet_to_check = deque(due_frames + [young_frame])
+        expected_reactions = {"due_0": 1, "due_1": 2}
+        self.facebook_helper.get_reactions_total_counts.return_value = expected_reactions
+
+        self.assertEqual(expected_reactions, self.testee._get_due_reactions_total_counts())
+        self.facebook_helper.get_reactions_total_counts.assert_called_once_with(["due_0", "due_1"])
+
+        # nothing due
+        self.facebook_helper.get_reactions_total_counts.reset_mock()
+        self.testee.yet_to_check = deque([young_frame])
+        self.assertEqual({}, self.testee._get_due_reactions_total_counts())
+        self.facebook_helper.get_reactions_total_counts.assert_not_called()
+
+    @patch("framebot.utils.append_json_line")
     def test_advance_bests(self, mock_json_dump: Mock):
-        self.testee.yet_to_check = self.test_frames
+        self.testee.yet_to_check = deque(self.test_frames)
         mock_check_and_post = Mock()
         self.testee._check_and_post = mock_check_and_post
         mock_check_and_post.side_effect = [True, True, False]
 
         self.testee._advance_bests()
         self.assertEqual(1, len(self.testee.yet_to_check))
-        self.assertEqual(2, mock_json_dump.call_count)
+        # removal is journaled once for all the checked frames
+        mock_json_dump.assert_called_once_with(
+            self.testee.journal_file, {"removed": [frame.post_id for frame in self.test_frames[:2]]})
         self.assertEqual(3, mock_check_and_post.call_count)
 
         mock_check_and_post.reset_mock()
@@ -153,14 +243,27 @@ class TestBestOfReposter(FileWritingTestCase):
         mock_check_and_post.reset_mock()
         mock_json_dump.reset_mock()
 
+        # FacebookError raised after some frames were checked
+        self.testee.yet_to_check = deque(self.test_frames)
+        mock_check_and_post.side_effect = [True, FacebookError(kwargs={"error": {
+            "message": "Not important",
+            "code": 0
+        }})]
+        self.testee._advance_bests()
+        self.assertEqual(len(self.test_frames) - 1, len(self.testee.yet_to_check))
+        self.assertEqual(1, mock_json_dump.call_count)
+
+        mock_check_and_post.reset_mock()
+        mock_json_dump.reset_mock()
+
         # nothing to check
-        self.testee.yet_to_check = []
+        self.testee.yet_to_check = deque()
         self.testee._advance_bests()
         mock_check_and_post.assert_not_called()
         mock_json_dump.assert_not_called()
 
-    @patch("framebot.utils.safe_json_dump")
-    @patch("shutil.copyfile")
+    @patch("framebot.utils.append_json_line")
+    @patch("framebot.utils.copy_file")
     def test_queue_for_frame_check(self, mock_copyfile: Mock, mock_json_dump: Mock):
         self.testee._queue_frame_for_check(self.test_frame)
         self.assertTrue(1, len(self.testee.yet_to_check))
@@ -169,21 +272,40 @@ class TestBestOfReposter(FileWritingTestCase):
         new_frame_path = self.testee.frames_dir.joinpath(self.test_frame.local_file.name)
         self.assertEqual(new_frame_path, queued_frame.local_file)
         mock_copyfile.assert_called_once_with(self.test_frame.local_file, new_frame_path)
-        mock_json_dump.assert_called_once_with(self.testee.yet_to_check_file, self.testee.yet_to_check)
+        mock_json_dump.assert_called_once_with(self.testee.journal_file, {"added": queued_frame})
+
+    def test_before_frame_upload(self):
+        mock_advance_bests = Mock()
+        self.testee._advance_bests = mock_advance_bests
+        self.testee.time_threshold = timedelta(days=1)
+
+        # empty queue
+        self.testee.before_frame_upload(self.test_frame)
+        mock_advance_bests.assert_not_called()
+
+        # oldest frame is still too young
+        self.testee.yet_to_check = deque([self.test_frame])
+        self.testee.before_frame_upload(self.test_frame)
+        mock_advance_bests.assert_not_called()
+
+        # oldest frame is due
+        self.test_frame.post_time = datetime.now() - timedelta(days=2)
+        self.testee.before_frame_upload(self.test_frame)
+        mock_advance_bests.assert_called_once_with()
 
     @patch("time.sleep")
     def test_handle_quicker(self, mock_sleep: Mock):
         def mock_advance_bests_behavior():
             # first call
             if len(self.testee.yet_to_check) == 3:
-                self.testee.yet_to_check.pop(0)
-                self.testee.yet_to_check.pop(1)
+                del self.testee.yet_to_check[0]
+                del self.testee.yet_to_check[1]
             # second call
             else:
-                self.testee.yet_to_check.pop(0)
+                self.testee.yet_to_check.popleft()
 
         og_threshold = self.testee.time_threshold
-        self.testee.yet_to_check = self.test_frames
+        self.testee.yet_to_check = deque(self.test_frames)
         mock_advance_bests = Mock(side_effect=mock_advance_bests_behavior)
         self.testee._advance_bests = mock_advance_bests
 
@@ -195,7 +317,7 @@ class TestBestOfReposter(FileWritingTestCase):
         self.assertEqual(1, mock_sleep.call_count)
 
 
-class TestMirroredFramePoster(TestCase):
+class TestMirroredFramePoster(FileWritingTestCase):
 
     def setUp(self) -> None:
         super(TestMirroredFramePoster, self).setUp()
@@ -209,18 +331,42 @@ class TestMirroredFramePoster(TestCase):
         self.assertEqual(f"Just a randomly mirrored image.\n-{default_bot_name}", self.testee.extra_message)
 
     def test_mirror_frame(self):
-        test_frame_image = Image.open(self.test_frame.local_file)
-        mirrored_frame_image = self.testee._mirror_frame(self.test_frame)
-        self.assertEqual(test_frame_image.size, mirrored_frame_image.size)
-        size = test_frame_image.size
-        self.assertEqual(
-            test_frame_image.crop((0, 0, size[0] // 2, size[1])),
-            mirrored_frame_image.crop((0, 0, size[0] // 2, size[1]))
-        )
-        self.assertEqual(
-            test_frame_image.crop((0, 0, size[0] // 2, size[1])),
-            ImageOps.mirror(mirrored_frame_image.crop((size[0] // 2, 0, size[0], size[1])))
-        )
+        cmyk_file = self.test_dir.joinpath("cmyk.jpg")
+        cmyk_image = Image.new("CMYK", (4, 2))
+        for x in range(cmyk_image.size[0]):
+            cmyk_image.putpixel((x, 0), (x * 60, 0, 255 - x * 60, 0))
+        cmyk_image.save(cmyk_file)
+        cmyk_frame = FacebookFrame(number=1, local_file=cmyk_file)
+        # bilevel frames don't have a NumPy array layout matching their raw one
+        bilevel_file = self.test_dir.joinpath("bilevel.png")
+        bilevel_image = Image.new("1", (4, 2))
+        bilevel_image.putpixel((0, 0), 1)
+        bilevel_image.putpixel((1, 1), 1)
+        bilevel_image.save(bilevel_file)
+        bilevel_frame = FacebookFrame(number=1, local_file=bilevel_file)
+
+        for frame in [self.test_frame, cmyk_frame, bilevel_frame]:
+            with self.subTest(frame=frame.local_file.name):
+                test_frame_image = Image.open(frame.local_file)
+                mirrored_frame_image = self.testee._mirror_frame(frame)
+                self.assertEqual(test_frame_image.mode, mirrored_frame_image.mode)
+                self.assertEqual(test_frame_image.size, mirrored_frame_image.size)
+                self.assertEqual(test_frame_image.info, mirrored_frame_image.info)
+                self.assertEqual(getattr(test_frame_image, "quantization", None), mirrored_frame_image.quantization)
+                self.assertEqual(JpegImagePlugin.get_sampling(test_frame_image), mirrored_frame_image.subsampling)
+                size = test_frame_image.size
+                self.assertEqual(
+                    test_frame_image.crop((0, 0, size[0] // 2, size[1])),
+                    mirrored_frame_image.crop((0, 0, size[0] // 2, size[1]))
+                )
+                self.assertEqual(
+                    test_frame_image.crop((0, 0, size[0] // 2, size[1])),
+                    ImageOps.mirror(mirrored_frame_image.crop((size[0] // 2, 0, size[0], size[1])))
+                )
+                # the mirrored frame can be encoded for posting
+                with open_image_stream(mirrored_frame_image) as stream:
+                    self.assertGreater(len(stream.read()), 0)
+                test_frame_image.close()
 
     def test_generate_message(self):
         # default extra + mirror original
@@ -6,10 +6,10 @@ from typing import Union
 from unittest import TestCase
 from unittest.mock import MagicMock, patch, DEFAULT, call
 
-from PIL import Image
+from PIL import Image, JpegImagePlugin
 from pyfacebook import FacebookError
 
-from framebot.social import FacebookHelper, open_image_stream
+from framebot.social import FacebookHelper, open_image_stream, _get_jpeg_save_options, JPEG_DEFAULT_QUALITY
 from test import RESOURCES_DIR
 
 PHOTO_ID = "1"
@@ -98,12 +98,50 @@ class TestFacebookHelper(TestCase):
         self.assertEqual(expected_result, result)
         mock_method.assert_called_with(object_id=object_id, connection=connection, files=None, data=None)
 
+        # streams are rewound before retrying
+        mock_method.reset_mock()
+        stream_content = b"image content"
+        read_contents = []
+
+        def read_and_fail(object_id, connection, files, data):
+            read_contents.append(files["source"].read())
+            if len(read_contents) == 1:
+                raise fake_error
+            return expected_result
+
+        mock_method.side_effect = read_and_fail
+        self.testee._post_with_retry(object_id=object_id, connection=connection,
+                                     files={"source": BytesIO(stream_content)}, max_retries=max_retries,
+                                     retry_time=retry_time)
+        self.assertEqual([stream_content, stream_content], read_contents)
+
         # access token expired
         mock_method.reset_mock()
         fake_error.code = 190
         mock_method.side_effect = fake_error
         self.assertRaises(FacebookError, self.testee._post_with_retry, object_id, connection)
 
+    @patch("time.sleep")
+    def test_post_with_retry_backoff(self, mock_sleep: MagicMock):
+        fake_error = FacebookError(kwargs={
+            "error": {
+                "code": 1,
+                "message": "Not really an error"
+            }
+        })
+        mock_method: MagicMock = self.mock_graph.post_object
+        mock_method.side_effect = fake_error
+        retry_time = timedelta(minutes=1)
+
+        self.assertRaises(FacebookError, self.testee._post_with_retry, object_id="id", connection="connection",
+                          retry_time=retry_time)
+        self.assertEqual(FacebookHelper.DEFAULT_MAX_RETRIES, mock_sleep.call_count)
+        for retry_count, sleep_call in enumerate(mock_sleep.call_args_list):
+            max_secs = min(FacebookHelper.MAX_RETRY_TIME.total_seconds(),
+                           retry_time.total_seconds() * 2 ** retry_count)
+            self.assertLessEqual(0, sleep_call[0][0])
+            self.assertGreaterEqual(max_secs, sleep_call[0][0])
+
     def test_get_reactions_count(self):
         mock_method: MagicMock = self.mock_graph.get_object
         mock_method.return_value = {"reactions": {"summary": {"total_count": REACTIONS}}}
@@ -135,6 +173,47 @@ class TestFacebookHelper(TestCase):
         ]
         mock_method.assert_has_calls(expected_calls)
 
+    def test_get_reactions_total_counts(self):
+        mock_method: MagicMock = self.mock_graph.get_objects
+        post_ids = [f"{POST_ID}{i}" for i in range(FacebookHelper.MAX_BATCH_SIZE + 1)]
+        mock_method.side_effect = lambda ids, fields: {
+            post_id: {"reactions": {"summary": {"total_count": REACTIONS}}} for post_id in ids.split(",")
+        }
+
+        reactions = self.testee.get_reactions_total_counts(post_ids)
+
+        self.assertEqual({post_id: REACTIONS for post_id in post_ids}, reactions)
+        self.assertEqual(2, mock_method.call_count)
+        mock_method.assert_has_calls([
+            call(ids=",".join(post_ids[:FacebookHelper.MAX_BATCH_SIZE]), fields="reactions.summary(total_count)"),
+            call(ids=",".join(post_ids[FacebookHelper.MAX_BATCH_SIZE:]), fields="reactions.summary(total_count)")
+        ])
+
+        # batch with a photo id
+        mock_method.reset_mock()
+        mock_method.side_effect = FacebookError(kwargs={
+            "error": {
+                "code": 100,
+                "message": "Tried accessing nonexisting field (reactions)"
+            }
+        })
+        self.testee.get_reactions_total_count = MagicMock(return_value=REACTIONS)
+        reactions = self.testee.get_reactions_total_counts(post_ids[:2])
+        self.assertEqual({post_id: REACTIONS for post_id in post_ids[:2]}, reactions)
+        self.assertEqual(2, self.testee.get_reactions_total_count.call_count)
+
+        # a single request failing in the fallback only leaves out its own post
+        self.testee.get_reactions_total_count.reset_mock()
+        self.testee.get_reactions_total_count.side_effect = [REACTIONS, FacebookError(kwargs={
+            "error": {
+                "code": 100,
+                "message": "Object does not exist"
+            }
+        }), REACTIONS]
+        reactions = self.testee.get_reactions_total_counts(post_ids[:3])
+        self.assertEqual({post_ids[0]: REACTIONS, post_ids[2]: REACTIONS}, reactions)
+        self.assertEqual(3, self.testee.get_reactions_total_count.call_count)
+
     def test_post_comment(self):
         # Image and message both None
         post_id = "post_id"
@@ -176,11 +255,31 @@ class TestFacebookHelper(TestCase):
 class TestStaticMethods(TestCase):
 
     def test_open_image_stream(self):
-        for image_variant in [DUMMY_IMAGE, str(DUMMY_IMAGE), Image.open(DUMMY_IMAGE)]:
+        for image_variant in [DUMMY_IMAGE, str(DUMMY_IMAGE), Image.open(DUMMY_IMAGE), DUMMY_IMAGE.read_bytes()]:
             with open_image_stream(image_variant) as im_stream:
                 self.assertTrue(issubclass(type(im_stream), IOBase))
             self.assertTrue(im_stream.closed)
 
+    def test_get_jpeg_save_options(self):
+        # jpeg source: quantization tables are reused
+        source_image = Image.open(DUMMY_IMAGE)
+        options = _get_jpeg_save_options(source_image)
+        self.assertEqual(source_image.quantization, options["qtables"])
+        self.assertNotIn("quality", options)
+        self.assertEqual(JpegImagePlugin.get_sampling(source_image), options["subsampling"])
+        self.assertFalse(options["optimize"])
+
+        # subsampling carried over from a decoded jpeg
+        derived_image = Image.new("RGB", (2, 2))
+        derived_image.subsampling = 0
+        self.assertEqual(0, _get_jpeg_save_options(derived_image)["subsampling"])
+
+        # no source tables
+        options = _get_jpeg_save_options(Image.new("RGB", (2, 2)))
+        self.assertEqual(JPEG_DEFAULT_QUALITY, options["quality"])
+        self.assertNotIn("qtables", options)
+        self.assertNotIn("subsampling", options)
+
 
 if __name__ == '__main__':
     unittest.main()
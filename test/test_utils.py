@@ -1,12 +1,16 @@
 import logging
+import os
 import shutil
+import stat
 import unittest
 import tempfile
 from pathlib import Path
+from unittest.mock import patch, Mock
 
 import jsonpickle
 
-from framebot.utils import get_logger, LoggingObject, safe_json_dump
+from framebot.utils import get_logger, LoggingObject, safe_json_dump, load_config, atomic_write, \
+    append_json_line, load_json_lines, copy_file, _fsync
 
 
 class TestUtils(unittest.TestCase):
@@ -33,6 +37,78 @@ class TestUtils(unittest.TestCase):
             read_obj = f.read()
             read_obj = jsonpickle.decode(read_obj)
             self.assertEqual(read_obj, test_obj)
+        # no temporary files left behind
+        self.assertEqual([test_json_file], list(self.test_dir.iterdir()))
+
+    def test_atomic_write(self):
+        test_file = self.test_dir.joinpath("test_file")
+        atomic_write(test_file, b"first")
+        self.assertEqual(b"first", test_file.read_bytes())
+        # overwritten, with no temporary files left behind
+        atomic_write(str(test_file), b"second")
+        self.assertEqual(b"second", test_file.read_bytes())
+        self.assertEqual([test_file], list(self.test_dir.iterdir()))
+
+    @unittest.skipIf(os.name != "posix", "permission bits are only meaningful on posix systems")
+    def test_atomic_write_permissions(self):
+        test_file = self.test_dir.joinpath("test_file")
+        umask = os.umask(0)
+        os.umask(umask)
+        # new file: default permissions, not the owner-only ones of temporary files
+        atomic_write(test_file, b"first")
+        self.assertEqual(0o666 & ~umask, stat.S_IMODE(test_file.stat().st_mode))
+        # existing file: its permissions are kept
+        test_file.chmod(0o640)
+        atomic_write(test_file, b"second")
+        self.assertEqual(0o640, stat.S_IMODE(test_file.stat().st_mode))
+
+    @patch("os.fsync")
+    @patch("framebot.utils.fcntl", create=True)
+    @patch("sys.platform", "darwin")
+    def test_fsync_full_fsync_fallback(self, mock_fcntl: Mock, mock_fsync: Mock):
+        # F_FULLFSYNC supported
+        _fsync(3)
+        mock_fcntl.fcntl.assert_called_once_with(3, mock_fcntl.F_FULLFSYNC)
+        mock_fsync.assert_not_called()
+        # not supported by the filesystem
+        mock_fcntl.fcntl.side_effect = OSError
+        _fsync(3)
+        mock_fsync.assert_called_once_with(3)
+
+    def test_json_lines(self):
+        test_file = self.test_dir.joinpath("test_journal")
+        test_objs = [{"intParam": 1}, {"strParam": "test"}]
+        for test_obj in test_objs:
+            append_json_line(test_file, test_obj)
+        self.assertEqual(test_objs, load_json_lines(test_file))
+        # an incomplete last line is ignored
+        with open(test_file, "ab") as f:
+            f.write(b'{"intPar')
+        self.assertEqual(test_objs, load_json_lines(str(test_file)))
+
+    def test_copy_file(self):
+        src_file = self.test_dir.joinpath("src_file")
+        src_file.write_bytes(b"content" * 1000)
+        dst_file = self.test_dir.joinpath("dst_file")
+        copy_file(src_file, dst_file)
+        self.assertEqual(src_file.read_bytes(), dst_file.read_bytes())
+        dst_file.unlink()
+        # fallback when copy_file_range is not supported
+        with patch("os.copy_file_range", side_effect=OSError, create=True):
+            copy_file(str(src_file), str(dst_file))
+        self.assertEqual(src_file.read_bytes(), dst_file.read_bytes())
+        # copying a file onto itself leaves it untouched
+        with self.assertRaises(shutil.SameFileError):
+            copy_file(src_file, str(src_file))
+        self.assertEqual(b"content" * 1000, src_file.read_bytes())
+
+    def test_load_config(self):
+        config_file = self.test_dir.joinpath("config.ini")
+        with open(config_file, "w", encoding="utf-8") as f:
+            f.write("[bot_settings]\nmovie_title = Title with ünicode\ndelete_files = False\n")
+        config = load_config(config_file)
+        self.assertEqual("Title with ünicode", config["bot_settings"]["movie_title"])
+        self.assertFalse(config["bot_settings"].getboolean("delete_files"))
 
     def test_get_logger(self):
         logger_name = "test_logger"